@@ -7,6 +7,7 @@ import os
 import random
 import hashlib
 import shutil
+import time
 from pathlib import Path
 import json
 from logging import Logger, getLogger
@@ -34,9 +35,13 @@ from torch.distributed.checkpoint.state_dict import (
 )
 from torch.distributed.fsdp import FSDPModule, MixedPrecisionPolicy
 from tqdm import tqdm
-from hyperargs import Conf, StrArg, IntArg, FloatArg, OptionArg, BoolArg
+from hyperargs import Conf, StrArg, IntArg, FloatArg, OptionArg, BoolArg, add_dependency, monitor_on
 from lmfuser_data.interfaces import Batch
 from lmfuser_data.utils import slowest_epoch
+try:
+    from lmfuser_data.row_worker import NextIter
+except ImportError:      # row worker protocol moved; depth changes then wait for the next stream start
+    NextIter = None  # type: ignore[assignment,misc]
 try:
     from lmfuser_data import merge_cursors
 except ImportError:      # lmfuser-data < 0.3.7
@@ -45,7 +50,7 @@ except ImportError:      # lmfuser-data < 0.3.7
 import wandb
 from wandb.wandb_run import Run
 
-from ..task import Tasks
+from ..task import LoaderParams, Tasks
 from ..utils import (
     get_global_rank,
     get_local_rank,
@@ -164,6 +169,69 @@ class _DevicePrefetcher:
         self._thread.join(timeout=5.0)
 
 
+class _PrefetchTuner:
+    """Decides when a task's row prefetch depth should grow.
+
+    Keeps an EWMA of how long each step waits on the loader and of the whole
+    step. While the wait is more than `threshold` of the step the loader is
+    starving the model, so the depth is doubled, up to `cap`. After a change it
+    sits out `window` steps, letting the averages settle on the new depth
+    before deciding again — a deeper queue takes a while to fill.
+    """
+
+    __slots__ = ('depth', 'cap', 'alpha', 'threshold', 'window', 'wait_ewma', 'step_ewma', '_seen')
+
+    def __init__(self, depth: int, cap: int, alpha: float = 0.1,
+                 threshold: float = 0.2, window: int = 50) -> None:
+        self.depth = depth
+        self.cap = cap
+        self.alpha = alpha
+        self.threshold = threshold
+        self.window = window
+        self.wait_ewma: float | None = None
+        self.step_ewma: float | None = None
+        self._seen = 0
+
+    def observe(self, wait_s: float, step_s: float) -> int | None:
+        """Feed one step's timings; returns the new depth when it changes."""
+        if self.wait_ewma is None or self.step_ewma is None:
+            self.wait_ewma, self.step_ewma = wait_s, step_s
+        else:
+            self.wait_ewma += self.alpha * (wait_s - self.wait_ewma)
+            self.step_ewma += self.alpha * (step_s - self.step_ewma)
+        self._seen += 1
+        if self._seen < self.window or self.depth >= self.cap:
+            return None
+        if self.wait_ewma <= self.threshold * self.step_ewma:
+            return None
+        self.depth = min(max(self.depth * 2, 1), self.cap)
+        self._seen = 0
+        return self.depth
+
+
+def _deepen_row_prefetch(loader: Any, depth: int) -> bool:
+    """Raise the row prefetch depth of a sharded loader's workers to `depth`.
+
+    A row worker only fills its request queue when its stream starts; after
+    that it keeps exactly what is in flight. So the difference is topped up
+    here, or the new depth would not take hold until the next epoch. Returns
+    False for loaders without row workers (single file, batch, empty).
+    """
+    distributors = getattr(loader, 'distributors', None)
+    if distributors is None:
+        return False
+    for distributor in distributors:
+        distributor.pre_fetch_factor = depth
+        for worker in getattr(distributor, 'workers', []):
+            worker.pre_fetch_factor = depth
+            if NextIter is None:
+                continue
+            while worker.queue_size < depth:
+                worker.instruct_queue.put(NextIter(), timeout=worker.worker_timeout)
+                worker.queue_size += 1
+    return True
+
+
 def _as_log_scalar(v: Any) -> float | None:
     """A metric value reduced to a float for logging, or None if it is not a
     scalar.
@@ -281,6 +349,10 @@ class FSDP2Wrapper(nn.Module):
     # DDP wrapper already relies on.
 
 
+# parse `reject_conflicts` first, so a config that turns it off is not
+# rejected by a check that ran before the switch was read
+@add_dependency('reject_conflicts', 'adaptive_row_prefetch')
+@add_dependency('reject_conflicts', 'device_prefetch')
 class DDPRunnerConfig(RunerConf):
 
     checkpoint_directory = StrArg('please set checkpoint directory here!')
@@ -324,6 +396,8 @@ class DDPRunnerConfig(RunerConf):
     # substantial for fast steps: a metrics all_gather + a dist_avg collective +
     # ~6 wandb/logger calls + .item() syncs + a barrier — about half the step
     # time for a 116M model. Logged values are point samples at the logged step.
+    # With stop_by: epoch the epoch is agreed on at the same cadence, so the
+    # run may take up to N - 1 steps past its last epoch.
     metric_sync_freq = IntArg(1, min_value=1)
     # DDP tuning. find_unused_parameters=1 (default, safest) supports tasks
     # where a subset of parameters gets no grad on some steps (GAN/GRPO mode
@@ -353,8 +427,19 @@ class DDPRunnerConfig(RunerConf):
     instruct_timeout = FloatArg(30.0, min_value=0.0)
     worker_timeout = FloatArg(30.0, min_value=0.0)
     shuffle_dataset = BoolArg(default=True)
+    # rows each loader worker reads ahead; single file loaders need at least 1
     row_prefetch = IntArg(0, min_value=0)
+    # grow row_prefetch per task while training: when the step spends more
+    # than a fifth of its wall time waiting on the loader (EWMA), the task's
+    # row workers get twice the depth, up to 8x row_prefetch (at least 8).
+    # Sharded loaders only, and not with device_prefetch — there the wait is
+    # hidden in the background thread and cannot be measured per step.
+    adaptive_row_prefetch = BoolArg(default=False)
     num_row_workers = IntArg(1, min_value=1)
+    # reject combinations where one setting silently cancels another, when the
+    # config is parsed rather than after the workers have started. Turn off to
+    # keep an old config that relied on the setting being ignored.
+    reject_conflicts = BoolArg(default=True)
     # batch-mode loader (train_dataloader_type: batch): TOTAL workers per rank,
     # shared-memory ring depth, and per-slot capacity
     num_batch_workers = IntArg(4, min_value=1)
@@ -364,6 +449,17 @@ class DDPRunnerConfig(RunerConf):
     resume_training = BoolArg(default=False)
     resume_path = StrArg(default=None, allow_none=True)
 
+    @monitor_on(['reject_conflicts', 'adaptive_row_prefetch', 'device_prefetch'])
+    def check_prefetch(self) -> None:
+        if not self.reject_conflicts.value():
+            return
+        if self.adaptive_row_prefetch.value() and self.device_prefetch.value():
+            raise ValueError(
+                'adaptive_row_prefetch requires device_prefetch to be off: the prefetch '
+                'thread hides the loader wait the tuner measures, so it would never act '
+                '(set reject_conflicts: false to allow it anyway)'
+            )
+
     @property
     def _default_precision(self) -> torch.dtype:
         # `model_precision` is an OptionArg, and Arg defines no __eq__, so
@@ -404,6 +500,14 @@ class DDPRunner(Runner[DDPRunnerConfig]):
         super().__init__(config, *args, **kwargs)
         if get_world_size() > 1:
             dist_init()
+        # fixed for the life of the process; read once, not on every log call
+        self._rank = get_global_rank()
+        # the wandb run, started by rank 0 on the first log; never set elsewhere
+        self._run: Run | None = None
+        # the epoch every rank agreed on at the last _sync_epoch, and the
+        # device buffer that agreement is reduced in
+        self._agreed_epoch: int | None = None
+        self._epoch_tensor: Tensor | None = None
 
         self.tasks = [task.conf for task in config.task_conf.tasks]
         self.step = 1
@@ -436,10 +540,9 @@ class DDPRunner(Runner[DDPRunnerConfig]):
             ) & 0x7FFFFFFF
         )
 
-        self.train_data_loaders = config.task_conf.get_train_dataloaders(
-            resume_states=getattr(self, '_resume_data_states', None),
+        loader_params = LoaderParams(
             batch_size=config.sub_batch_size.value(), # type: ignore
-            seed=self.data_seed, # type: ignore
+            seed=self.data_seed,
             shuffle=config.shuffle_dataset.value(), # type: ignore
             prefetch_factor=config.row_prefetch.value(), # type: ignore
             num_workers=config.num_row_workers.value(), # type: ignore
@@ -448,39 +551,16 @@ class DDPRunner(Runner[DDPRunnerConfig]):
             instruct_timeout=config.instruct_timeout.value(), # type: ignore
             worker_timeout=config.worker_timeout.value(), # type: ignore
             world_size=get_world_size(),
-            rank=get_global_rank(),
+            rank=self._rank,
             num_batch_workers=config.num_batch_workers.value(), # type: ignore
             batch_queue_depth=config.batch_queue_depth.value(), # type: ignore
             batch_slot_mb=config.batch_slot_mb.value(), # type: ignore
         )
-
-        self.eval_data_loaders = config.task_conf.get_eval_dataloaders(
-            batch_size=config.sub_batch_size.value(), # type: ignore
-            seed=self.data_seed, # type: ignore
-            shuffle=config.shuffle_dataset.value(), # type: ignore
-            prefetch_factor=config.row_prefetch.value(), # type: ignore
-            num_workers=config.num_row_workers.value(), # type: ignore
-            ignore_error=config.ignore_data_error.value(), # type: ignore
-            qps=config.data_row_qps.value(),
-            instruct_timeout=config.instruct_timeout.value(), # type: ignore
-            worker_timeout=config.worker_timeout.value(), # type: ignore
-            world_size=get_world_size(),
-            rank=get_global_rank(),
-        )
-
-        self.test_data_loaders = config.task_conf.get_test_dataloaders(
-            batch_size=config.sub_batch_size.value(), # type: ignore
-            seed=self.data_seed, # type: ignore
-            shuffle=config.shuffle_dataset.value(), # type: ignore
-            prefetch_factor=config.row_prefetch.value(), # type: ignore
-            num_workers=config.num_row_workers.value(), # type: ignore
-            ignore_error=config.ignore_data_error.value(), # type: ignore
-            qps=config.data_row_qps.value(),
-            instruct_timeout=config.instruct_timeout.value(), # type: ignore
-            worker_timeout=config.worker_timeout.value(), # type: ignore
-            world_size=get_world_size(),
-            rank=get_global_rank(),
+        self.train_data_loaders = config.task_conf.get_train_dataloaders(
+            loader_params, resume_states=getattr(self, '_resume_data_states', None)
         )
+        self.eval_data_loaders = config.task_conf.get_eval_dataloaders(loader_params)
+        self.test_data_loaders = config.task_conf.get_test_dataloaders(loader_params)
 
         self.train_task_idxs: list[int] = []
         for idx, loader in enumerate(self.train_data_loaders):
@@ -568,11 +648,10 @@ class DDPRunner(Runner[DDPRunnerConfig]):
         other ranks and loaders without cursor support return/contribute
         None). A COLLECTIVE call when world_size > 1 — every rank must
         reach it."""
-        per_task = [
-            loader.state_dict()
-            if loader is not None and hasattr(loader, 'state_dict') else None
-            for loader in self.train_data_loaders
-        ]
+        per_task = []
+        for loader in self.train_data_loaders:
+            state_dict = getattr(loader, 'state_dict', None)
+            per_task.append(state_dict() if callable(state_dict) else None)
         # NOTE: the emptiness check must NOT short-circuit ahead of the
         # all_gather_object below — that is a collective, and a rank returning
         # early while the others enter it hangs the job until the NCCL timeout.
@@ -704,7 +783,11 @@ class DDPRunner(Runner[DDPRunnerConfig]):
         elif stop_metric == 'epoch':
             total_epoch = self.config.total_epoch.value()
             assert total_epoch is not None
-            return self.epoch >= total_epoch
+            # the agreed count, not self.epoch: a prefetch thread can move a
+            # loader's epoch at any moment, and a rank stopping on its own
+            # count leaves its peers waiting in the next step's collectives
+            assert self._agreed_epoch is not None, '_sync_epoch must run before the first stop check'
+            return self._agreed_epoch >= total_epoch
         else:
             raise ValueError(f'stop_metric must be either "epoch" or "step", got "{stop_metric}" instead.')
 
@@ -803,15 +886,14 @@ class DDPRunner(Runner[DDPRunnerConfig]):
             return next(it)
 
     @property
-    def _wandb(self) -> Run:
-        if getattr(self, '_run', None) is None:
-            wandb.init(
+    def _wandb(self) -> Run | None:
+        if self._run is None and self._rank == 0:
+            self._run = wandb.init(
                 project=self.config.project_name.value(),
                 name=self.config.run_name.value(),
                 config=self.config.to_dict()
-            ) if get_global_rank() == 0 else ...
-            self._run = True
-        return self._run # type: ignore
+            )
+        return self._run
 
     @property
     def logger(self) -> Logger:
@@ -827,6 +909,9 @@ class DDPRunner(Runner[DDPRunnerConfig]):
         tasks of different sizes `stop_by: epoch` stopped while the largest
         task had been round only partway. A task with weight 0.0 is never
         sampled and is excluded so it cannot stall the run instead.
+
+        This is the LOCAL count; the one every rank agrees on is what
+        `_sync_epoch` returns.
         """
         # Index by TASK id, not by position: train_data_loaders is per task
         # and holds None for eval-only tasks, while train_task_weights is
@@ -837,9 +922,38 @@ class DDPRunner(Runner[DDPRunnerConfig]):
             for idx in self.train_task_idxs
         ]
         if not pairs:
-            return self.pre_epoch
-        epochs, weights = zip(*pairs)
-        return slowest_epoch(list(epochs), list(weights)) + self.pre_epoch
+            local = self.pre_epoch
+        else:
+            epochs, weights = zip(*pairs)
+            local = slowest_epoch(list(epochs), list(weights)) + self.pre_epoch
+        return local
+
+    def _sync_epoch(self) -> int:
+        """Agree on the epoch across ranks: the minimum of every rank's count.
+
+        Ranks read different shards and roll over at different steps, so for a
+        while around every boundary their local counts disagree — and with
+        `stop_by: epoch` one rank stopped while the others went on into the
+        next step's collectives and hung. A single integer all-reduce, instead
+        of gathering every rank's value as an object.
+
+        A COLLECTIVE: call it only where every rank is on the same step. It
+        must not hide behind a "has my count changed" check either — that
+        differs per rank, and a rank skipping the all-reduce pairs its peers'
+        call with whatever collective it issues next. A gate on the step is
+        fine. The result is kept in `_agreed_epoch`, which `_should_stop` reads.
+        """
+        agreed = self.epoch
+        if get_world_size() > 1 and torch.distributed.is_initialized():
+            # one buffer for the run, refilled in place: this is called every
+            # metric_sync_freq steps in epoch mode
+            if self._epoch_tensor is None:
+                self._epoch_tensor = torch.zeros(1, dtype=torch.int64, device=torch_device())
+            self._epoch_tensor.fill_(agreed)
+            torch.distributed.all_reduce(self._epoch_tensor, op=torch.distributed.ReduceOp.MIN)
+            agreed = int(self._epoch_tensor.item())
+        self._agreed_epoch = agreed
+        return agreed
 
     def _pbar_status(self, **fields: Any) -> None:
         """Update named markers shown after the progress bar.
@@ -864,12 +978,37 @@ class DDPRunner(Runner[DDPRunnerConfig]):
             )
 
     def step_log(self, data: dict[str, Any], console: bool = True) -> None:
-        self._wandb
-        if get_global_rank() != 0:
+        # only rank 0 logs, so the other ranks leave before touching wandb
+        if self._rank != 0:
             return
+        run = self._wandb
+        assert run is not None
         if console:
             self.logger.critical(f'step:{self.step}\t{data}')
-        wandb.log(data, step=self.step)
+        # the run's own bound method: a `from wandb import log` alias would
+        # hold the pre-init stub, which wandb.init swaps out of the module
+        run.log(data, step=self.step)
+
+    def _tune_row_prefetch(self, task_id: int, wait_s: float, step_s: float) -> None:
+        """Feed one step's loader wait to the task's prefetch tuner, and apply
+        the depth it asks for. Local to each rank: no collective."""
+        if not hasattr(self, '_prefetch_tuners'):
+            self._prefetch_tuners: dict[int, _PrefetchTuner] = {}
+        tuner = self._prefetch_tuners.get(task_id)
+        if tuner is None:
+            depth = self.config.row_prefetch.value() or 0
+            tuner = _PrefetchTuner(depth, cap=max(depth, 1) * 8)
+            self._prefetch_tuners[task_id] = tuner
+        depth = tuner.observe(wait_s, step_s)
+        if depth is None:
+            return
+        task_name = self.tasks[task_id].__class__.__name__
+        if not _deepen_row_prefetch(self.train_data_loaders[task_id], depth):
+            tuner.cap = tuner.depth    # nothing to tune on this loader type
+            return
+        logger.info(f'{task_name}: loader wait is {tuner.wait_ewma:.3f}s of a '
+                    f'{tuner.step_ewma:.3f}s step, row prefetch raised to {depth}')
+        self.step_log({f'{task_name}/train/row_prefetch': depth}, console=False)
 
     def _one_train_step(self, **kwargs: Any) -> None:
         # clean the gradients
@@ -880,6 +1019,11 @@ class DDPRunner(Runner[DDPRunnerConfig]):
         task_id = self.sample_train_task_id()
         task = self.tasks[task_id]
 
+        tune_prefetch = (self.config.adaptive_row_prefetch.value()
+                         and not self.config.device_prefetch.value())
+        step_t0 = time.perf_counter()
+        fetch_wait = 0.0
+
         # calculate loss
         running_loss: float = 0.0
         running_loss_t = None
@@ -912,8 +1056,7 @@ class DDPRunner(Runner[DDPRunnerConfig]):
                         self.model.set_requires_gradient_sync(True, recurse=True)
 
                 # compute loss for each sub_batch
-                import time as _time
-                _tf0 = _time.perf_counter()
+                _tf0 = time.perf_counter()
                 if self.config.device_prefetch.value():
                     if not hasattr(self, '_prefetchers'):
                         self._prefetchers = {}
@@ -926,18 +1069,19 @@ class DDPRunner(Runner[DDPRunnerConfig]):
                         )
                         self._prefetchers[task_id] = pf
                     _dev_batch = pf.next()
-                    _tf1 = _tf2 = _time.perf_counter()
+                    _tf1 = _tf2 = time.perf_counter()
                 else:
                     _raw_batch = self._next_train_batch(task_id)
-                    _tf1 = _time.perf_counter()
+                    _tf1 = time.perf_counter()
+                    fetch_wait += _tf1 - _tf0
                     _dev_batch = self._batch_to_device(_raw_batch)
-                    _tf2 = _time.perf_counter()
+                    _tf2 = time.perf_counter()
                 if self.config.step_timing.value():
                     if not hasattr(self, '_phase_acc'):
                         self._phase_acc = [0.0, 0.0, 0.0, 0]
                     self._phase_acc[0] += _tf1 - _tf0
                     self._phase_acc[1] += _tf2 - _tf1
-                _tf2b = _time.perf_counter()
+                _tf2b = time.perf_counter()
                 subbatch_result = task.train_step(
                     model=self.model, # type: ignore
                     batch=_dev_batch,
@@ -946,7 +1090,7 @@ class DDPRunner(Runner[DDPRunnerConfig]):
                     acc_step=acc_idx,
                 )
                 if self.config.step_timing.value():
-                    self._phase_acc[2] += _time.perf_counter() - _tf2b
+                    self._phase_acc[2] += time.perf_counter() - _tf2b
                 if isinstance(subbatch_result, torch.Tensor):
                     subbatch_result = {'loss': subbatch_result}
                 if 'loss' not in subbatch_result:
@@ -1121,6 +1265,8 @@ class DDPRunner(Runner[DDPRunnerConfig]):
             {f'{task.__class__.__name__}/train/learning_rate': current_lr}
         ) if log_this else None
         self.scheduler.step()
+        if tune_prefetch:
+            self._tune_row_prefetch(task_id, fetch_wait, time.perf_counter() - step_t0)
 
         if log_this:
             other_step_results = defaultdict(list)
@@ -1172,9 +1318,11 @@ class DDPRunner(Runner[DDPRunnerConfig]):
                 root_logger.removeHandler(h)
             root_logger.addHandler(tqdm_handler)
 
-        self._last_epoch = self.epoch
         stop_metric = self.config.stop_by.value()
         assert stop_metric in ('step', 'epoch')
+        # stop_by epoch is decided from the agreed count, so every rank stops
+        # on the same step; in step mode the epoch is only reported
+        self._last_epoch = self._sync_epoch() if stop_metric == 'epoch' else self.epoch
         if stop_metric == 'step':
             self._pbar_train = tqdm(
                 total=self.config.total_step.value(),
@@ -1203,15 +1351,28 @@ class DDPRunner(Runner[DDPRunnerConfig]):
                 # (0.1s); the call itself is just a counter bump
                 self._pbar_train.update(1)
             elif stop_metric == 'epoch':
-                current_epoch = self.epoch
-                if current_epoch > self._last_epoch:
-                    self._last_epoch = self.epoch
-                    self._pbar_train.update(1)
+                # on the metric sync steps only, like the other collectives of
+                # the step: the .item() waits for the whole step on the GPU.
+                # The gate is the step, the same on every rank, and the run
+                # overshoots the last epoch by at most metric_sync_freq - 1 steps
+                if self.step % (self.config.metric_sync_freq.value() or 1) == 0:
+                    current_epoch = self._sync_epoch()
+                    if current_epoch > self._last_epoch:
+                        self._last_epoch = current_epoch
+                        self._pbar_train.update(1)
             else:
                 raise ValueError(f'Unknown stop metric: {stop_metric}. Please choose from "step" and "epoch".')
 
         self.test()
         self._pbar_train.close()
+        self.close()
+
+    def close(self) -> None:
+        # prefetch threads first: they read from the loaders being shut down
+        for pf in getattr(self, '_prefetchers', {}).values():
+            pf.close()
+        self._prefetchers = {}
+        self.config.task_conf.close()
 
     def _eval_one_task(self, task_id: int, **kwargs: Any) -> None:
         os.environ['TOKENIZERS_PARALLELISM'] = 'false'
@@ -1,5 +1,12 @@
 from typing import Any, Callable
 from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import logging
+import queue
+import random
+import threading
+import time
 
 import torch
 from torch import nn
@@ -7,16 +14,100 @@ from lmfuser_data.interfaces import Batch, Row
 from lmfuser_data.scanners import Scanner
 from lmfuser_data import DataLoader, PyTorchDataLoader, BatchDataLoader
 from lmfuser_data.interfaces import SubclassTracer
-from hyperargs import Conf, StrArg, FloatArg, IntArg, OptionArg, add_dependency, monitor_on
+from lmfuser_data.utils import slowest_epoch
+try:
+    from lmfuser_data.row_worker import Stop
+except ImportError:      # row worker protocol moved; sharded workers are then terminated outright
+    Stop = None  # type: ignore[assignment,misc]
+from hyperargs import Conf, StrArg, FloatArg, IntArg, BoolArg, OptionArg, add_dependency, monitor_on
+
+logger = logging.getLogger(__name__)
 
 def scanner_type_list() -> list[str]:
     return list(Scanner.all_subclass_names())
 
 
+@dataclass(frozen=True, slots=True)
+class LoaderParams:
+    '''
+        The settings a task's dataloaders are built with. Frozen, so one instance is passed down
+        whole and doubles as the key of the tasks' loader caches.
+    '''
+    batch_size: int
+    seed: int
+    shuffle: bool
+    prefetch_factor: int
+    ignore_error: bool
+    qps: float | None
+    instruct_timeout: float
+    worker_timeout: float
+    num_workers: int
+    rank: int
+    world_size: int
+    # batch-mode train loaders only
+    num_batch_workers: int = 4
+    batch_queue_depth: int = 4
+    batch_slot_mb: int = 128
+
+
+def _check_single_file(params: LoaderParams) -> None:
+    # torch rejects a prefetch_factor below 1 once there are workers, but only
+    # on the first batch, after every other loader has been built and started
+    if params.num_workers >= 1 and params.prefetch_factor < 1:
+        raise ValueError(
+            f'a single file loader with num_row_workers={params.num_workers} needs '
+            f'row_prefetch >= 1, got row_prefetch={params.prefetch_factor}'
+        )
+
+
+def _resize_in_place(conf: Conf, name: str, num: int, factory: Callable[[], Any]) -> None:
+    '''Resize the list field `name` of `conf` to `num` items, trimming or appending in place.
+
+    A list still inherited from the class is shared by every instance, so the instance
+    takes its own copy first: growing the shared list made every later instance of the
+    class start out with this one's entries.
+    '''
+    items = vars(conf).get(name)
+    if items is None:
+        items = list(getattr(conf, name))
+        setattr(conf, name, items)
+    del items[num:]
+    items.extend(factory() for _ in range(num - len(items)))
+
+
+def _close_loader(loader: Any) -> None:
+    '''Stop the worker processes of `loader`, whichever kind of loader it is.
+
+    Batch and out-of-order loaders shut themselves down. A sharded loader has no
+    close, so each of its row workers is told to stop, and terminated if it has
+    not within a few seconds. A single-file loader's torch workers belong to the
+    iterator over it, not to the loader, and end with that iterator.
+    '''
+    close = getattr(loader, 'close', None)
+    if callable(close):
+        close()
+        return
+    workers = [
+        worker
+        for distributor in getattr(loader, 'distributors', ())
+        for worker in getattr(distributor, 'workers', ())
+        if getattr(worker, 'worker', None) is not None and worker.worker.is_alive()
+    ]
+    for worker in workers:
+        if Stop is not None:
+            worker.instruct_queue.put(Stop())
+    for worker in workers:
+        worker.worker.join(timeout=5.0)
+        if worker.worker.is_alive():
+            worker.worker.terminate()
+
+
 class EmptyDataLoader:
     '''
         EmptyDataLoader is a class that provides empty data for running with no data requierment.
     '''
+    __slots__ = ('init_step',)
+
     def __init__(self, init_step: int = 0) -> None:
         self.init_step = init_step
 
@@ -32,6 +123,138 @@ class EmptyDataLoader:
         return it_wrap()
 
 
+class OutOfOrderDataLoader:
+    '''
+        OutOfOrderDataLoader reads every path through its own loader on a background thread and
+        yields batches in the order they arrive, so a slow path (remote storage, a congested link)
+        cannot hold back the fast ones. Each path keeps at most `in_flight` batches buffered.
+        Batches are self-contained, so nothing is paired across paths; but the mixture now
+        follows delivery speed, not the path weights.
+    '''
+    __slots__ = ('loaders', 'in_flight', 'stagger', '_queue', '_slots', '_stop', '_error', '_threads')
+
+    def __init__(self, loaders: list[DataLoader], in_flight: int = 4, stagger: float = 0.05) -> None:
+        self.loaders = loaders
+        self.in_flight = in_flight
+        self.stagger = stagger
+        self._queue: queue.Queue = queue.Queue()
+        self._slots = [threading.Semaphore(in_flight) for _ in loaders]
+        self._stop = threading.Event()
+        self._error: BaseException | None = None
+        self._threads: list[threading.Thread] = []
+
+    @property
+    def epoch(self) -> int:
+        return slowest_epoch([loader.epoch for loader in self.loaders])
+
+    def _run(self, idx: int) -> None:
+        # paths start one after another rather than as one burst of requests
+        time.sleep(idx * self.stagger)
+        try:
+            while not self._stop.is_set():
+                for batch in self.loaders[idx]:     # one epoch per pass
+                    self._slots[idx].acquire()
+                    if self._stop.is_set():
+                        return
+                    self._queue.put((idx, batch))
+        except BaseException as e:     # never die silently: the consumer would block forever
+            self._error = e
+            self._queue.put(None)
+
+    def __iter__(self) -> Iterator[Batch]:
+        if not self._threads:
+            self._threads = [
+                threading.Thread(target=self._run, args=(idx,), daemon=True)
+                for idx in range(len(self.loaders))
+            ]
+            for thread in self._threads:
+                thread.start()
+
+        def it_wrap() -> Iterator[Batch]:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    raise RuntimeError('out-of-order loader thread died') from self._error
+                idx, batch = item
+                self._slots[idx].release()
+                yield batch
+        return it_wrap()
+
+    def close(self) -> None:
+        # a thread parked on a full slot never reaches the stop check on its own
+        self._stop.set()
+        for slot in self._slots:
+            slot.release()
+        for thread in self._threads:
+            thread.join(timeout=5.0)
+        for loader in self.loaders:
+            _close_loader(loader)
+
+
+class _StaggeredStart:
+    '''
+        Flow processor that holds a loader worker back for a random moment in [0, spread) seconds
+        before its first row, then runs `flow_fn` (if any) as usual. Workers start together, and on
+        a remote backend their first reads arrive as one burst that the endpoint throttles; spread
+        out, they arrive about `spread / num_workers` apart. Random rather than by worker index,
+        which the flow function has no way to know.
+    '''
+    __slots__ = ('spread', 'flow_fn', '_started')
+
+    def __init__(self, spread: float, flow_fn: Callable[[Iterable[Row]], Iterable[Row]] | None) -> None:
+        self.spread = spread
+        self.flow_fn = flow_fn
+        self._started = False
+
+    def __call__(self, rows: Iterable[Row]) -> Iterator[Row]:
+        # runs in the worker process, on its first pull from the flow
+        if not self._started:
+            self._started = True
+            # a fresh, OS-seeded generator: forked workers share the parent's global one
+            time.sleep(random.Random().uniform(0.0, self.spread))
+        yield from (rows if self.flow_fn is None else self.flow_fn(rows))
+
+
+class _BucketShuffle:
+    '''
+        Flow processor that shuffles rows through a bucket of up to `size` rows. The bucket starts
+        at `init` rows and grows by `increment` each time as many rows have gone out as it holds,
+        so the first rows leave once `init` are in rather than once a full bucket is, which with
+        heavy row processing can take minutes.
+    '''
+    __slots__ = ('size', 'init', 'increment', 'flow_fn', '_rng')
+
+    def __init__(
+        self,
+        size: int,
+        init: int,
+        increment: int,
+        seed: int,
+        flow_fn: Callable[[Iterable[Row]], Iterable[Row]] | None,
+    ) -> None:
+        self.size = size
+        self.init = init
+        self.increment = increment
+        self.flow_fn = flow_fn
+        self._rng = random.Random(seed)
+
+    def __call__(self, rows: Iterable[Row]) -> Iterator[Row]:
+        bucket: list[Row] = []
+        cap, emitted = self.init, 0
+        for row in (rows if self.flow_fn is None else self.flow_fn(rows)):
+            if len(bucket) < cap:
+                bucket.append(row)
+                continue
+            idx = self._rng.randrange(len(bucket))
+            yield bucket[idx]
+            bucket[idx] = row
+            emitted += 1
+            if emitted >= cap and cap < self.size:
+                cap, emitted = min(cap + self.increment, self.size), 0
+        self._rng.shuffle(bucket)
+        yield from bucket
+
+
 @add_dependency('num_train_data_path', 'train_data_path_list')
 @add_dependency('num_train_data_path', 'train_data_weights')
 @add_dependency('num_eval_data_path', 'eval_data_path_list')
@@ -54,204 +277,323 @@ class TaskBase(Conf, SubclassTracer):
     scanner_type = OptionArg(default='C4Scanner', option_fn=scanner_type_list)
 
     train_dataloader_type = OptionArg(default='single file', options=['single file', 'sharded', 'batch', 'empty'])
+    # sharded train loaders only: read each path on its own thread and take
+    # batches as they arrive instead of in mixture order, with up to
+    # `in_flight` batches buffered per path. Masks slow remote paths at the
+    # cost of the path weights: faster paths contribute more batches.
+    # Its epoch counts batches fetched into the buffer, not consumed, so
+    # stop_by: epoch can end up to in_flight + 1 batches per path early.
+    out_of_order = BoolArg(default=False)
+    in_flight = IntArg(4, min_value=1)
+    # seconds between worker starts, on average: each loader worker waits a
+    # random moment in [0, startup_stagger * num_workers) before its first
+    # read, so a remote backend is not hit by every worker at once. 0 = off.
+    # The spread must stay below worker_timeout, or the last worker times out.
+    startup_stagger = FloatArg(0.0, min_value=0.0)
+    # shuffled sharded train loaders only: pass each worker's rows through a
+    # shuffle bucket of bucket_size rows. It opens at bucket_size_init rows
+    # (default: full size) and grows by bucket_size_increment (default: the
+    # initial size) so the first batch does not wait on a full bucket. Batch
+    # loaders resume from their shard cursors, which would skip every row
+    # still in the bucket at a checkpoint, so they never get one.
+    bucket_size = IntArg(None, allow_none=True, min_value=1)
+    bucket_size_init = IntArg(None, allow_none=True, min_value=1)
+    bucket_size_increment = IntArg(None, allow_none=True, min_value=1)
     eval_dataloader_type = OptionArg(default='single file', options=['single file', 'sharded', 'empty'])
     test_dataloader_type = OptionArg(default='single file', options=['single file', 'sharded', 'empty'])
 
-    _train_dataloader: DataLoader | None | PyTorchDataLoader | EmptyDataLoader = None
-    _eval_dataloader: DataLoader | None | PyTorchDataLoader | EmptyDataLoader = None
-    _test_dataloader: DataLoader | None | PyTorchDataLoader | EmptyDataLoader = None
+    # bumped whenever a TaskBase subclass is defined, so task_list() knows
+    # when its cached names have gone stale
+    _registry_version = 0
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        TaskBase._registry_version += 1
+
+    def __init__(self) -> None:
+        # Built loaders, keyed on the params they were built with. A single
+        # slot per split handed back the first loader for any later call, even
+        # one asking for a different batch size or rank. Per instance: a dict
+        # declared at class scope would be shared by every task of the class.
+        self._train_dataloaders: dict[
+            LoaderParams, DataLoader | PyTorchDataLoader | BatchDataLoader | OutOfOrderDataLoader | EmptyDataLoader
+        ] = {}
+        self._eval_dataloaders: dict[LoaderParams, DataLoader | PyTorchDataLoader | EmptyDataLoader] = {}
+        self._test_dataloaders: dict[LoaderParams, DataLoader | PyTorchDataLoader | EmptyDataLoader] = {}
+        # (paths, weights) per split, read out of their Args once; set before
+        # super().__init__() because the monitors that clear it fire there
+        self._resolved_sources: dict[str, tuple[tuple[str, ...], tuple[float, ...]]] = {}
+        self._scanner_cls: type[Scanner] | None = None
+        super().__init__()
+
+    @monitor_on('scanner_type')
+    def reset_scanner_cls(self) -> None:
+        self._scanner_cls = None
+        self.close()
+
+    @monitor_on([
+        'train_dataloader_type', 'eval_dataloader_type', 'test_dataloader_type',
+        'out_of_order', 'in_flight', 'startup_stagger',
+        'bucket_size', 'bucket_size_init', 'bucket_size_increment',
+    ])
+    def reset_dataloaders(self) -> None:
+        # the loader cache is keyed on LoaderParams alone, so a loader built
+        # before one of these changed would otherwise still be handed out
+        self.close()
+
+    def _get_worker_flow(
+        self, num_workers: int, worker_timeout: float, shuffle_seed: int | None = None
+    ) -> Callable[[Iterable[Row]], Iterable[Row]] | None:
+        '''The task's flow processor, wrapped in the bucket shuffle (only given a `shuffle_seed`)
+        and the startup stagger when they are configured. Left alone otherwise: a flow function
+        makes the workers' row counts unknown to the loader. The stagger must end within
+        `worker_timeout`, the loader's wait for a worker's first row.'''
+        flow_fn = self.get_flow_processor()
+        size = self.bucket_size.value()
+        if size is not None and shuffle_seed is not None:
+            init = min(self.bucket_size_init.value() or size, size)
+            flow_fn = _BucketShuffle(size, init, self.bucket_size_increment.value() or init, shuffle_seed, flow_fn)
+        stagger = self.startup_stagger.value()
+        if stagger and num_workers > 1:
+            if stagger * num_workers >= worker_timeout:
+                raise ValueError(
+                    f'startup_stagger={stagger} spreads the first reads of {num_workers} workers '
+                    f'over {stagger * num_workers}s, which is not below worker_timeout={worker_timeout}: '
+                    f'the last worker to start would time out'
+                )
+            flow_fn = _StaggeredStart(stagger * num_workers, flow_fn)
+        return flow_fn
+
+    def _get_scanner_cls(self) -> type[Scanner]:
+        # get_subclass walks the whole scanner subclass tree; look it up once
+        if self._scanner_cls is None:
+            scanner_type = self.scanner_type.value()
+            assert scanner_type is not None, 'scanner_type is None'
+            self._scanner_cls = Scanner.get_subclass(scanner_type)
+        return self._scanner_cls
+
+    @monitor_on([
+        'num_train_data_path', 'train_data_path_list', 'train_data_weights',
+        'num_eval_data_path', 'eval_data_path_list', 'eval_data_weights',
+        'num_test_data_path', 'test_data_path_list', 'test_data_weights',
+    ])
+    def reset_resolved_sources(self) -> None:
+        # parse() hands back new Args and the parsers assign whole lists, so
+        # every change to a path or weight comes through one of these fields.
+        # Swapping an element inside a list by hand does not: call this after.
+        self._resolved_sources.clear()
+        # the cached loaders read the old sources
+        self.close()
+
+    def _resolve_sources(self, split: str) -> tuple[tuple[str, ...], tuple[float, ...]]:
+        sources = self._resolved_sources.get(split)
+        if sources is None:
+            sources = (
+                tuple(p.value() for p in getattr(self, f'{split}_data_path_list')),
+                tuple(w.value() for w in getattr(self, f'{split}_data_weights')),
+            )
+            self._resolved_sources[split] = sources
+        return sources
 
     @monitor_on('num_train_data_path')
     def set_train_path_list(self) -> None:
         num = self.num_train_data_path.value()
         assert isinstance(num, int)
-        if len(self.train_data_path_list) > num:
-            self.train_data_path_list = self.train_data_path_list[:num]
-            self.train_data_weights = self.train_data_weights[:num]
-        elif len(self.train_data_path_list) < num:
-            self.train_data_path_list += [StrArg('Enther the path to the data file.')] * (num - len(self.train_data_path_list))
-            self.train_data_weights += [FloatArg(1.0, min_value=0.0, max_value=1.0)] * (num - len(self.train_data_weights))
+        _resize_in_place(self, 'train_data_path_list', num, lambda: StrArg('Enther the path to the data file.'))
+        _resize_in_place(self, 'train_data_weights', num, lambda: FloatArg(1.0, min_value=0.0, max_value=1.0))
 
     @monitor_on('num_eval_data_path')
     def set_eval_path_list(self) -> None:
         num = self.num_eval_data_path.value()
         assert isinstance(num, int)
-        if len(self.eval_data_path_list) > num:
-            self.eval_data_path_list = self.eval_data_path_list[:num]
-            self.eval_data_weights = self.eval_data_weights[:num]
-        elif len(self.eval_data_path_list) < num:
-            self.eval_data_path_list += [StrArg('Enther the path to the data file.')] * (num - len(self.eval_data_path_list))
-            self.eval_data_weights += [FloatArg(1.0, min_value=0.0, max_value=1.0)] * (num - len(self.eval_data_weights))
+        _resize_in_place(self, 'eval_data_path_list', num, lambda: StrArg('Enther the path to the data file.'))
+        _resize_in_place(self, 'eval_data_weights', num, lambda: FloatArg(1.0, min_value=0.0, max_value=1.0))
 
     @monitor_on('num_test_data_path')
     def set_test_path_list(self) -> None:
         num = self.num_test_data_path.value()
         assert isinstance(num, int)
-        if len(self.test_data_path_list) > num:
-            self.test_data_path_list = self.test_data_path_list[:num]
-            # was a duplicate of the line above, so shrinking the test list
-            # left the weights at their old length — paths and weights then
-            # disagreed. The train and eval monitors alongside get this right.
-            self.test_data_weights = self.test_data_weights[:num]
-        elif len(self.test_data_path_list) < num:
-            self.test_data_path_list += [StrArg('Enther the path to the data file.')] * (num - len(self.test_data_path_list))
-            self.test_data_weights += [FloatArg(1.0, min_value=0.0, max_value=1.0)] * (num - len(self.test_data_weights))
+        _resize_in_place(self, 'test_data_path_list', num, lambda: StrArg('Enther the path to the data file.'))
+        _resize_in_place(self, 'test_data_weights', num, lambda: FloatArg(1.0, min_value=0.0, max_value=1.0))
 
     def _get_train_dataloader(
-        self,
-        batch_size: int,
-        seed: int,
-        shuffle: bool,
-        prefetch_factor: int,
-        ignore_error: bool,
-        qps: float | None,
-        instruct_timeout: float,
-        worker_timeout: float,
-        num_workers: int,
-        rank: int,
-        world_size: int,
-        num_batch_workers: int = 4,
-        batch_queue_depth: int = 4,
-        batch_slot_mb: int = 128,
-        resume_state: dict | None = None,
-    ) -> None | DataLoader | PyTorchDataLoader | BatchDataLoader | EmptyDataLoader:
+        self, params: LoaderParams, resume_state: dict | None = None
+    ) -> None | DataLoader | PyTorchDataLoader | BatchDataLoader | OutOfOrderDataLoader | EmptyDataLoader:
         if self.num_train_data_path.value() == 0:
             return None
-        if self._train_dataloader is not None:
-            return self._train_dataloader
-        path_list = [p.value() for p in self.train_data_path_list]
-        weight_list = [w.value() for w in self.train_data_weights]
-        scanner_type = self.scanner_type.value()
-        assert scanner_type is not None, 'scanner_type is None'
+        # resume_state only seeds a new loader; a cached one already carries
+        # its own position, so it is not part of the key
+        if params in self._train_dataloaders:
+            return self._train_dataloaders[params]
+        self._release(self._train_dataloaders)
 
         dataloader_type = self.train_dataloader_type.value()
         assert dataloader_type in ('sharded', 'single file', 'batch', 'empty'), \
             f'Unknown dataloader type: {dataloader_type}'
 
+        loader: DataLoader | PyTorchDataLoader | BatchDataLoader | OutOfOrderDataLoader | EmptyDataLoader
+        if dataloader_type == 'empty':
+            # reads nothing, so there are no paths or scanner to resolve
+            loader = EmptyDataLoader(init_step=0)
+            self._train_dataloaders[params] = loader
+            return loader
+
+        paths, weights = self._resolve_sources('train')
+        path_list, weight_list = list(paths), list(weights)
+        scanner_cls = self._get_scanner_cls()
+
         if dataloader_type == 'batch':
-            self._train_dataloader = BatchDataLoader(
-                batch_size=batch_size,
+            loader = BatchDataLoader(
+                batch_size=params.batch_size,
                 path_list=path_list, # type: ignore
                 distributor_weights=weight_list, # type: ignore
-                scanner_type=Scanner.get_subclass(scanner_type),
-                seed=seed,
-                shuffle=shuffle,
+                scanner_type=scanner_cls,
+                seed=params.seed,
+                shuffle=params.shuffle,
                 map_fn=self.get_row_processor(),
-                flow_fn=self.get_flow_processor(),
+                # no shuffle seed, so no bucket: see bucket_size
+                flow_fn=self._get_worker_flow(params.num_batch_workers, params.worker_timeout),
                 collate_fn=self.get_collate_fn(),
                 batch_map_fn=self.get_batch_processor(),
-                ignore_error=ignore_error,
-                num_workers=num_batch_workers,
-                queue_depth=batch_queue_depth,
-                slot_mb=batch_slot_mb,
-                num_ranks=world_size,
-                rank_idx=rank,
-                worker_timeout=worker_timeout,
+                ignore_error=params.ignore_error,
+                num_workers=params.num_batch_workers,
+                queue_depth=params.batch_queue_depth,
+                slot_mb=params.batch_slot_mb,
+                num_ranks=params.world_size,
+                rank_idx=params.rank,
+                worker_timeout=params.worker_timeout,
                 # only forward when present: lmfuser-data < 0.3.0 has no
                 # resume_state parameter
                 **({'resume_state': resume_state} if resume_state else {}),
             )
+        elif dataloader_type == 'sharded' and self.out_of_order.value():
+            # a zero-weight path is never drawn, so it gets no reader at all
+            live_paths = [p for p, w in zip(path_list, weight_list) if w > 0] # type: ignore
+            if not live_paths:
+                # no reader thread would ever run, and the first next() would block forever
+                raise ValueError(
+                    f'{self.__class__.__name__}: every train path weight is 0, so out_of_order has no path to read'
+                )
+            if len(set(w for w in weight_list if w > 0)) > 1: # type: ignore
+                logger.warning(
+                    f'{self.__class__.__name__}: out_of_order ignores the train path weights '
+                    f'{weight_list}; each path contributes as fast as it delivers'
+                )
+            loader = OutOfOrderDataLoader(
+                [
+                    DataLoader(
+                        batch_size=params.batch_size,
+                        path_list=[path], # type: ignore
+                        scanner_type=scanner_cls,
+                        seed=params.seed,
+                        shuffle=params.shuffle,
+                        pre_fetch_factor=params.prefetch_factor,
+                        ignore_error=params.ignore_error,
+                        qps=params.qps,
+                        instruct_timeout=params.instruct_timeout,
+                        worker_timeout=params.worker_timeout,
+                        num_workers=params.num_workers,
+                        map_fn=self.get_row_processor(),
+                        flow_fn=self._get_worker_flow(
+                            params.num_workers, params.worker_timeout, params.seed if params.shuffle else None
+                        ),
+                        batch_map_fn=self.get_batch_processor(),
+                        rank_idx=params.rank,
+                        num_ranks=params.world_size,
+                    )
+                    for path in live_paths
+                ],
+                in_flight=self.in_flight.value(), # type: ignore
+            )
         elif dataloader_type == 'sharded':
-            self._train_dataloader = DataLoader(
-                batch_size=batch_size,
+            loader = DataLoader(
+                batch_size=params.batch_size,
                 path_list=path_list, # type: ignore
                 distributor_weights=weight_list, # type: ignore
-                scanner_type=Scanner.get_subclass(scanner_type),
-                seed=seed,
-                shuffle=shuffle,
-                pre_fetch_factor=prefetch_factor,
-                ignore_error=ignore_error,
-                qps=qps,
-                instruct_timeout=instruct_timeout,
-                worker_timeout=worker_timeout,
-                num_workers=num_workers,
+                scanner_type=scanner_cls,
+                seed=params.seed,
+                shuffle=params.shuffle,
+                pre_fetch_factor=params.prefetch_factor,
+                ignore_error=params.ignore_error,
+                qps=params.qps,
+                instruct_timeout=params.instruct_timeout,
+                worker_timeout=params.worker_timeout,
+                num_workers=params.num_workers,
                 map_fn=self.get_row_processor(),
-                flow_fn=self.get_flow_processor(),
+                flow_fn=self._get_worker_flow(params.num_workers, params.worker_timeout, params.seed if params.shuffle else None),
                 batch_map_fn=self.get_batch_processor(),
-                rank_idx=rank,
-                num_ranks=world_size,
+                rank_idx=params.rank,
+                num_ranks=params.world_size,
             )
         elif dataloader_type == 'single file':
-            self._train_dataloader = PyTorchDataLoader(
-                batch_size=batch_size,
+            _check_single_file(params)
+            loader = PyTorchDataLoader(
+                batch_size=params.batch_size,
                 path_list=path_list, # type: ignore
-                scanner_type=Scanner.get_subclass(scanner_type),
-                seed=seed,
-                shuffle=shuffle,
-                pre_fetch_factor=prefetch_factor,
-                num_workers=num_workers,
-                num_ranks=world_size,
-                rank_idx=rank,
+                scanner_type=scanner_cls,
+                seed=params.seed,
+                shuffle=params.shuffle,
+                pre_fetch_factor=params.prefetch_factor,
+                num_workers=params.num_workers,
+                num_ranks=params.world_size,
+                rank_idx=params.rank,
                 collate_fn=self.get_collate_fn(),
                 drop_last=False
             )
-        elif dataloader_type == 'empty':
-            self._train_dataloader = EmptyDataLoader(init_step=0)
         else:
             raise ValueError(f'Unknown dataloader type: {dataloader_type}')
 
-        return self._train_dataloader
+        self._train_dataloaders[params] = loader
+        return loader
 
     def _get_eval_dataloader(
-        self,
-        batch_size: int,
-        seed: int,
-        shuffle: bool,
-        prefetch_factor: int,
-        ignore_error: bool,
-        qps: float | None,
-        instruct_timeout: float,
-        worker_timeout: float,
-        num_workers: int,
-        rank: int,
-        world_size: int
+        self, params: LoaderParams
     ) -> None | DataLoader | PyTorchDataLoader | EmptyDataLoader:
         if self.num_eval_data_path.value() == 0:
             return None
-        if self._eval_dataloader is not None:
-            return self._eval_dataloader
-        path_list = [p.value() for p in self.eval_data_path_list]
-        weight_list = [w.value() for w in self.eval_data_weights]
-        scanner_type = self.scanner_type.value()
-        assert scanner_type is not None, 'scanner_type is None'
-
-        dataloader_type = self.eval_dataloader_type.value()
-        assert dataloader_type is not None, 'dataloader_type is None'
+        if params in self._eval_dataloaders:
+            return self._eval_dataloaders[params]
+        self._release(self._eval_dataloaders)
+        paths, weights = self._resolve_sources('eval')
+        path_list, weight_list = list(paths), list(weights)
+        scanner_cls = self._get_scanner_cls()
 
         dataloader_type = self.eval_dataloader_type.value()
         assert dataloader_type in ('sharded', 'single file'), f'Unknown dataloader type: {dataloader_type}'
 
+        loader: DataLoader | PyTorchDataLoader | EmptyDataLoader
         if dataloader_type == 'sharded':
-            self._eval_dataloader = DataLoader(
-                batch_size=batch_size,
+            loader = DataLoader(
+                batch_size=params.batch_size,
                 path_list=path_list, # type: ignore
                 distributor_weights=weight_list, # type: ignore
-                scanner_type=Scanner.get_subclass(scanner_type),
-                seed=seed,
-                shuffle=shuffle,
-                pre_fetch_factor=prefetch_factor,
-                ignore_error=ignore_error,
-                qps=qps,
-                instruct_timeout=instruct_timeout,
-                worker_timeout=worker_timeout,
-                num_workers=num_workers,
+                scanner_type=scanner_cls,
+                seed=params.seed,
+                shuffle=params.shuffle,
+                pre_fetch_factor=params.prefetch_factor,
+                ignore_error=params.ignore_error,
+                qps=params.qps,
+                instruct_timeout=params.instruct_timeout,
+                worker_timeout=params.worker_timeout,
+                num_workers=params.num_workers,
                 map_fn=self.get_row_processor(),
-                flow_fn=self.get_flow_processor(),
+                flow_fn=self._get_worker_flow(params.num_workers, params.worker_timeout),
                 batch_map_fn=self.get_batch_processor(),
-                rank_idx=rank,
-                num_ranks=world_size,
+                rank_idx=params.rank,
+                num_ranks=params.world_size,
             )
         elif dataloader_type == 'single file':
-            self._eval_dataloader = PyTorchDataLoader(
-                batch_size=batch_size,
+            _check_single_file(params)
+            loader = PyTorchDataLoader(
+                batch_size=params.batch_size,
                 path_list=path_list, # type: ignore
-                scanner_type=Scanner.get_subclass(scanner_type),
-                seed=seed,
-                shuffle=shuffle,
-                pre_fetch_factor=prefetch_factor,
-                num_workers=num_workers,
-                num_ranks=world_size,
-                rank_idx=rank,
+                scanner_type=scanner_cls,
+                seed=params.seed,
+                shuffle=params.shuffle,
+                pre_fetch_factor=params.prefetch_factor,
+                num_workers=params.num_workers,
+                num_ranks=params.world_size,
+                rank_idx=params.rank,
                 collate_fn=self.get_collate_fn(),
                 drop_last=False,
                 # score every row exactly once: a padded sampler
@@ -261,72 +603,61 @@ class TaskBase(Conf, SubclassTracer):
                 exact_pass=True
             )
         elif dataloader_type == 'empty':
-            self._eval_dataloader = EmptyDataLoader(init_step=0)
+            loader = EmptyDataLoader(init_step=0)
         else:
             raise ValueError(f'Unknown dataloader type: {dataloader_type}')
 
-        return self._eval_dataloader
+        self._eval_dataloaders[params] = loader
+        return loader
 
     def _get_test_dataloader(
-        self,
-        batch_size: int,
-        seed: int,
-        shuffle: bool,
-        prefetch_factor: int,
-        ignore_error: bool,
-        qps: float | None,
-        instruct_timeout: float,
-        worker_timeout: float,
-        num_workers: int,
-        rank: int,
-        world_size: int
+        self, params: LoaderParams
     ) -> None | DataLoader | PyTorchDataLoader | EmptyDataLoader:
         if self.num_test_data_path.value() == 0:
             return None
-        if self._test_dataloader is not None:
-            return self._test_dataloader
-        path_list = [p.value() for p in self.test_data_path_list]
-        weight_list = [w.value() for w in self.test_data_weights]
-        scanner_type = self.scanner_type.value()
-        assert scanner_type is not None, 'scanner_type is None'
-
-        dataloader_type = self.test_dataloader_type.value()
-        assert dataloader_type is not None, 'dataloader_type is None'
+        if params in self._test_dataloaders:
+            return self._test_dataloaders[params]
+        self._release(self._test_dataloaders)
+        paths, weights = self._resolve_sources('test')
+        path_list, weight_list = list(paths), list(weights)
+        scanner_cls = self._get_scanner_cls()
 
         dataloader_type = self.test_dataloader_type.value()
         assert dataloader_type in ('sharded', 'single file'), f'Unknown dataloader type: {dataloader_type}'
 
+        loader: DataLoader | PyTorchDataLoader | EmptyDataLoader
         if dataloader_type == 'sharded':
-            self._test_dataloader = DataLoader(
-                batch_size=batch_size,
+            loader = DataLoader(
+                batch_size=params.batch_size,
                 path_list=path_list, # type: ignore
                 distributor_weights=weight_list, # type: ignore
-                scanner_type=Scanner.get_subclass(scanner_type),
-                seed=seed,
-                shuffle=shuffle,
-                pre_fetch_factor=prefetch_factor,
-                ignore_error=ignore_error,
-                qps=qps,
-                instruct_timeout=instruct_timeout,
-                worker_timeout=worker_timeout,
-                num_workers=num_workers,
+                scanner_type=scanner_cls,
+                seed=params.seed,
+                shuffle=params.shuffle,
+                pre_fetch_factor=params.prefetch_factor,
+                ignore_error=params.ignore_error,
+                qps=params.qps,
+                instruct_timeout=params.instruct_timeout,
+                worker_timeout=params.worker_timeout,
+                num_workers=params.num_workers,
                 map_fn=self.get_row_processor(),
-                flow_fn=self.get_flow_processor(),
+                flow_fn=self._get_worker_flow(params.num_workers, params.worker_timeout),
                 batch_map_fn=self.get_batch_processor(),
-                rank_idx=rank,
-                num_ranks=world_size,
+                rank_idx=params.rank,
+                num_ranks=params.world_size,
             )
         elif dataloader_type == 'single file':
-            self._test_dataloader = PyTorchDataLoader(
-                batch_size=batch_size,
+            _check_single_file(params)
+            loader = PyTorchDataLoader(
+                batch_size=params.batch_size,
                 path_list=path_list, # type: ignore
-                scanner_type=Scanner.get_subclass(scanner_type),
-                seed=seed,
-                shuffle=shuffle,
-                pre_fetch_factor=prefetch_factor,
-                num_workers=num_workers,
-                num_ranks=world_size,
-                rank_idx=rank,
+                scanner_type=scanner_cls,
+                seed=params.seed,
+                shuffle=params.shuffle,
+                pre_fetch_factor=params.prefetch_factor,
+                num_workers=params.num_workers,
+                num_ranks=params.world_size,
+                rank_idx=params.rank,
                 collate_fn=self.get_collate_fn(),
                 drop_last=False,
                 # score every row exactly once: a padded sampler
@@ -336,11 +667,29 @@ class TaskBase(Conf, SubclassTracer):
                 exact_pass=True
             )
         elif dataloader_type == 'empty':
-            self._test_dataloader = EmptyDataLoader(init_step=0)
+            loader = EmptyDataLoader(init_step=0)
         else:
             raise ValueError(f'Unknown dataloader type: {dataloader_type}')
 
-        return self._test_dataloader
+        self._test_dataloaders[params] = loader
+        return loader
+
+    @staticmethod
+    def _release(cache: dict) -> None:
+        # one live loader per split: a loader built for other params has no
+        # reader left, and its workers would otherwise run until exit
+        for loader in cache.values():
+            _close_loader(loader)
+        cache.clear()
+
+    def close(self) -> None:
+        '''Shut down every cached dataloader and forget it.
+
+        The worker processes of sharded, batch and out-of-order loaders are
+        stopped here, deterministically, instead of whenever the process exits.
+        '''
+        for cache in (self._train_dataloaders, self._eval_dataloaders, self._test_dataloaders):
+            self._release(cache)
 
     def train_step(
         self, model: nn.Module,
@@ -377,12 +726,31 @@ class TaskBase(Conf, SubclassTracer):
         return None
 
     def get_row_processor(self) -> Callable[[Row], Row] | None:
+        '''Return the function applied to every row in the loader workers.
+
+        Returns:
+            Callable[[Row], Row] | None: The row function, or None (the default) to leave rows
+                as they are.
+        '''
         return None
 
     def get_flow_processor(self) -> Callable[[Iterable[Row]], Iterable[Row]] | None:
+        '''Return the function wrapped around each worker's row stream.
+
+        Returns:
+            Callable[[Iterable[Row]], Iterable[Row]] | None: The stream function, or None (the
+                default) to pass the stream through. With a stream function the loader can no
+                longer count the rows of a shard, so its workers report no length.
+        '''
         return None
 
     def get_batch_processor(self) -> Callable[[Batch], Batch] | None:
+        '''Return the function applied to every collated batch.
+
+        Returns:
+            Callable[[Batch], Batch] | None: The batch function, or None (the default) to skip
+                the call.
+        '''
         return None
 
     def get_collate_fn(self) -> Callable[[list[Row]], Batch] | None:
@@ -392,8 +760,17 @@ class TaskBase(Conf, SubclassTracer):
 class Task(TaskBase):
     pass
 
+_task_names: tuple[int, tuple[str, ...]] = (-1, ())
+
 def task_list() -> list[str]:
-    return list(TaskBase.all_subclass_names())
+    # OptionArg re-reads its options on every parse and repr; walk the
+    # subclass tree only when a TaskBase subclass has been defined since
+    global _task_names
+    version, names = _task_names
+    if version != TaskBase._registry_version:
+        names = tuple(TaskBase.all_subclass_names())
+        _task_names = (TaskBase._registry_version, names)
+    return list(names)
 
 
 @add_dependency('conf', 'task_name')
@@ -416,118 +793,51 @@ class Tasks(Conf):
     num_tasks = IntArg(1, min_value=1)
     tasks = [TaskSelector()]
     task_weights = [FloatArg(1.0, min_value=0.0, max_value=1.0)]
+    # build the tasks' loaders on a thread pool: construction reads shard
+    # lists (often over HTTP) and starts worker processes, so N tasks start
+    # about as fast as the slowest one. Off by default because the workers
+    # are forked from those threads, and a fork taken while another thread
+    # holds a lock (stdout, a connection pool) can hang the child.
+    parallel_loader_init = BoolArg(default=False)
 
     @monitor_on('num_tasks')
     def change_task_list(self) -> None:
         num = self.num_tasks.value()
         assert num is not None, 'num_tasks is None'
 
-        if len(self.tasks) > num:
-            self.tasks = self.tasks[:num]
-            self.task_weights = self.task_weights[:num]
-        elif len(self.tasks) < num:
-            self.tasks += [TaskSelector() for _ in range(num - len(self.tasks))]
-            self.task_weights += [
-                FloatArg(1.0, min_value=0.0, max_value=1.0) for _ in range(num - len(self.task_weights))
-            ]
+        _resize_in_place(self, 'tasks', num, TaskSelector)
+        _resize_in_place(self, 'task_weights', num, lambda: FloatArg(1.0, min_value=0.0, max_value=1.0))
+
+    def close(self) -> None:
+        for task in self.tasks:
+            task.conf.close()
+
+    def _map_tasks(self, build: Callable[[int, TaskBase], Any]) -> list[Any]:
+        confs = [task.conf for task in self.tasks]
+        if not self.parallel_loader_init.value() or len(confs) < 2:
+            return [build(i, conf) for i, conf in enumerate(confs)]
+        # a task object listed twice is built once: two threads missing its
+        # loader cache together would each start a loader
+        first: dict[int, int] = {}
+        for i, conf in enumerate(confs):
+            first.setdefault(id(conf), i)
+        with ThreadPoolExecutor(max_workers=min(len(first), 8)) as pool:
+            futures = {key: pool.submit(build, i, confs[i]) for key, i in first.items()}
+            return [futures[id(conf)].result() for conf in confs]
 
     def get_train_dataloaders(
-        self,
-        batch_size: int,
-        seed: int,
-        shuffle: bool,
-        prefetch_factor: int,
-        ignore_error: bool,
-        qps: float | None,
-        instruct_timeout: float,
-        worker_timeout: float,
-        num_workers: int,
-        rank: int,
-        world_size: int,
-        num_batch_workers: int = 4,
-        batch_queue_depth: int = 4,
-        batch_slot_mb: int = 128,
-        resume_states: list[dict | None] | None = None,
-    ) -> list[DataLoader | None | PyTorchDataLoader | BatchDataLoader | EmptyDataLoader]:
-        return [
-            task.conf._get_train_dataloader(
-                batch_size=batch_size,
-                seed=seed,
-                shuffle=shuffle,
-                prefetch_factor=prefetch_factor,
-                ignore_error=ignore_error,
-                qps=qps,
-                instruct_timeout=instruct_timeout,
-                worker_timeout=worker_timeout,
-                num_workers=num_workers,
-                rank=rank,
-                world_size=world_size,
-                num_batch_workers=num_batch_workers,
-                batch_queue_depth=batch_queue_depth,
-                batch_slot_mb=batch_slot_mb,
-                resume_state=(resume_states[i] if resume_states else None),
-            )
-            for i, task in enumerate(self.tasks)
-        ]
+        self, params: LoaderParams, resume_states: list[dict | None] | None = None
+    ) -> list[DataLoader | None | PyTorchDataLoader | BatchDataLoader | OutOfOrderDataLoader | EmptyDataLoader]:
+        return self._map_tasks(lambda i, conf: conf._get_train_dataloader(
+            params, resume_state=(resume_states[i] if resume_states else None)
+        ))
 
     def get_eval_dataloaders(
-        self,
-        batch_size: int,
-        seed: int,
-        shuffle: bool,
-        prefetch_factor: int,
-        ignore_error: bool,
-        qps: float | None,
-        instruct_timeout: float,
-        worker_timeout: float,
-        num_workers: int,
-        rank: int,
-        world_size: int
+        self, params: LoaderParams
     ) -> list[DataLoader | None | PyTorchDataLoader | EmptyDataLoader]:
-        return [
-            task.conf._get_eval_dataloader(
-                batch_size=batch_size,
-                seed=seed,
-                shuffle=shuffle,
-                prefetch_factor=prefetch_factor,
-                ignore_error=ignore_error,
-                qps=qps,
-                instruct_timeout=instruct_timeout,
-                worker_timeout=worker_timeout,
-                num_workers=num_workers,
-                rank=rank,
-                world_size=world_size,
-            )
-            for task in self.tasks
-        ]
+        return self._map_tasks(lambda i, conf: conf._get_eval_dataloader(params))
 
     def get_test_dataloaders(
-        self,
-        batch_size: int,
-        seed: int,
-        shuffle: bool,
-        prefetch_factor: int,
-        ignore_error: bool,
-        qps: float | None,
-        instruct_timeout: float,
-        worker_timeout: float,
-        num_workers: int,
-        rank: int,
-        world_size: int
+        self, params: LoaderParams
     ) -> list[DataLoader | None | PyTorchDataLoader | EmptyDataLoader]:
-        return [
-            task.conf._get_test_dataloader(
-                batch_size=batch_size,
-                seed=seed,
-                shuffle=shuffle,
-                prefetch_factor=prefetch_factor,
-                ignore_error=ignore_error,
-                qps=qps,
-                instruct_timeout=instruct_timeout,
-                worker_timeout=worker_timeout,
-                num_workers=num_workers,
-                rank=rank,
-                world_size=world_size,
-            )
-            for task in self.tasks
-        ]
+        return self._map_tasks(lambda i, conf: conf._get_test_dataloader(params))
@@ -1,4 +1,5 @@
 import os
+import functools
 from typing import Any, overload, Union, Optional, Literal
 from random import Random
 
@@ -422,16 +423,22 @@ def cal_acc_num(batch_size: int, sub_batch_size: int, world_size: int) -> int:
     return acc_num
 
 
+@functools.lru_cache(maxsize=None)
+def _is_overridden(cls: type, method_name: str) -> bool:
+    # a class's methods are fixed once it is defined, so the answer is too;
+    # the ValueError below is not cached and is raised again on every call
+    for parent in cls.__bases__:
+        if not hasattr(parent, method_name):
+            continue
+        return getattr(cls, method_name, None) is not getattr(parent, method_name, None)
+
+    raise ValueError(f'No such method {method_name} in parent classes')
+
+
 class MethodOverideChecker:
     def is_overridden(self, method_name: str) -> bool:
         """
         Check if the method `method_name` is overridden in this instance's class
         compared to the Parent class.
         """
-        cls = self.__class__
-        for parent in self.__class__.__bases__:
-            if not hasattr(parent, method_name):
-                continue
-            return getattr(cls, method_name, None) is not getattr(parent, method_name, None)
-
-        raise ValueError(f'No such method {method_name} in parent classes')
+        return _is_overridden(self.__class__, method_name)
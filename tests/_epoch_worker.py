@@ -0,0 +1,34 @@
+import sys, os
+import torch.distributed as dist
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+_DATA_SRC = os.path.join(os.path.dirname(__file__), '..', '..', 'LMFuser-Data', 'src')
+if os.path.isdir(_DATA_SRC):
+    sys.path.insert(0, _DATA_SRC)
+dist.init_process_group('gloo')
+from lmfuser.runners.ddp_runner import DDPRunner
+
+
+class Loader:
+    def __init__(self, epoch: int) -> None:
+        self.epoch = epoch
+
+
+class Fake:
+    epoch = DDPRunner.epoch
+
+
+r = dist.get_rank()
+fake = Fake()
+fake.train_data_loaders = [Loader(3 if r == 0 else 1)]
+fake.train_task_idxs = [0]
+fake.task_weights = [1.0]
+fake.pre_epoch = 0
+fake._epoch_tensor = None
+assert DDPRunner._sync_epoch(fake) == 1
+buf = fake._epoch_tensor
+fake.train_data_loaders[0].epoch += 1
+assert DDPRunner._sync_epoch(fake) == 2
+assert fake._epoch_tensor is buf, 'a new tensor was allocated for the second sync'
+assert fake._agreed_epoch == 2
+dist.barrier(); dist.destroy_process_group()
+if r == 0: print('EPOCH_SYNC_OK')
@@ -0,0 +1,98 @@
+"""Adaptive row prefetch (DDPRunnerConfig.adaptive_row_prefetch).
+
+Run:  python tests/test_adaptive_prefetch.py
+
+The tuner must only grow the depth while the loader is actually starving the
+step, never past its cap, and the depth change must reach the row workers
+that are already streaming — they fill their request queue only when their
+stream starts.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+_DATA_SRC = os.path.join(os.path.dirname(__file__), '..', '..', 'LMFuser-Data', 'src')
+if os.path.isdir(_DATA_SRC):
+    sys.path.insert(0, _DATA_SRC)
+
+
+def test_tuner_doubles_only_while_starved() -> None:
+    from lmfuser.runners.ddp_runner import _PrefetchTuner
+
+    tuner = _PrefetchTuner(depth=2, cap=16, window=5)
+    # the loader wait is 1% of the step: nothing to gain
+    assert all(tuner.observe(0.001, 0.1) is None for _ in range(50))
+    assert tuner.depth == 2
+
+    # the loader wait is half the step: doubled once per window, capped
+    changes = [d for d in (tuner.observe(0.05, 0.1) for _ in range(100)) if d is not None]
+    assert changes == [4, 8, 16], f'unexpected depth changes: {changes}'
+    assert tuner.depth == 16
+
+    # a configured depth of 0 must still be able to grow
+    tuner = _PrefetchTuner(depth=0, cap=8, window=1)
+    assert tuner.observe(0.05, 0.1) == 1
+    print('PASS 1: tuner doubles the depth while starved, up to its cap')
+
+
+def test_depth_reaches_running_workers() -> None:
+    from lmfuser.runners import ddp_runner
+
+    class FakeQueue:
+        def __init__(self) -> None:
+            self.items: list = []
+
+        def put(self, item, timeout=None) -> None:
+            self.items.append(item)
+
+    class FakeWorker:
+        def __init__(self, in_flight: int) -> None:
+            self.pre_fetch_factor = in_flight
+            self.queue_size = in_flight
+            self.worker_timeout = 1.0
+            self.instruct_queue = FakeQueue()
+
+    class FakeDistributor:
+        def __init__(self) -> None:
+            self.pre_fetch_factor = 2
+            self.workers = [FakeWorker(2), FakeWorker(2)]
+
+    class FakeLoader:
+        def __init__(self) -> None:
+            self.distributors = [FakeDistributor()]
+
+    loader = FakeLoader()
+    assert ddp_runner._deepen_row_prefetch(loader, 8)
+    for worker in loader.distributors[0].workers:
+        assert worker.pre_fetch_factor == 8
+        if ddp_runner.NextIter is not None:
+            assert worker.queue_size == 8
+            assert len(worker.instruct_queue.items) == 6
+
+    # single file / batch / empty loaders have no row workers to tune
+    assert not ddp_runner._deepen_row_prefetch(object(), 8)
+    print('PASS 2: a deeper prefetch reaches the workers already streaming')
+
+
+def test_config_rejects_tuning_under_device_prefetch() -> None:
+    from lmfuser.runners.ddp_runner import DDPRunnerConfig
+
+    both = {'adaptive_row_prefetch': True, 'device_prefetch': True}
+    try:
+        DDPRunnerConfig.from_dict(both)
+    except ValueError as e:
+        assert 'device_prefetch' in str(e)
+    else:
+        raise AssertionError('a tuner that can never act was accepted')
+    # opting out works wherever `reject_conflicts` sits in the file
+    config = DDPRunnerConfig.from_dict({**both, 'reject_conflicts': False})
+    assert config.adaptive_row_prefetch.value() and config.device_prefetch.value()
+    DDPRunnerConfig.from_dict({'adaptive_row_prefetch': True})
+    print('PASS 3: adaptive prefetch under device prefetch is rejected at parse time')
+
+
+if __name__ == '__main__':
+    test_tuner_doubles_only_while_starved()
+    test_depth_reaches_running_workers()
+    test_config_rejects_tuning_under_device_prefetch()
+    print('ALL PASS')
@@ -232,6 +232,99 @@ def test_eval_fsdp_dispatch_matches_training() -> None:
     print('PASS 9: eval/test fsdp dispatch matches the training sites')
 
 
+def test_stop_by_epoch_reads_the_agreed_count() -> None:
+    """`epoch` is this rank's own count and moves whenever a prefetch thread
+    finishes a pass. _should_stop must decide on the count _sync_epoch agreed
+    on, or a rank whose loader just rolled over stops alone."""
+    from hyperargs import IntArg, OptionArg
+    from lmfuser.runners.ddp_runner import DDPRunner
+
+    class FakeLoader:
+        def __init__(self, epoch: int) -> None:
+            self.epoch = epoch
+
+    class Config:
+        stop_by = OptionArg('epoch', options=['step', 'epoch'])
+        total_epoch = IntArg(2)
+
+    class Fake:
+        epoch = DDPRunner.epoch
+
+    fake = Fake()
+    fake.config = Config()
+    fake.train_data_loaders = [FakeLoader(1)]
+    fake.train_task_idxs = [0]
+    fake.task_weights = [1.0]
+    fake.pre_epoch = 0
+    fake._epoch_tensor = None
+    assert DDPRunner._sync_epoch(fake) == 1 and not DDPRunner._should_stop(fake)
+
+    # the loader rolls over between the sync and the stop check
+    fake.train_data_loaders[0].epoch = 2
+    assert fake.epoch == 2, 'epoch is no longer the local count'
+    assert not DDPRunner._should_stop(fake), 'the stop check read the local count'
+    assert DDPRunner._sync_epoch(fake) == 2 and DDPRunner._should_stop(fake)
+    print('PASS 10: stop_by epoch decides on the agreed count only')
+
+
+def test_wandb_run_is_started_once_and_only_on_rank_0() -> None:
+    """_wandb used to record a started run as `True` and put `...` in place of
+    the init call on other ranks; it must hold the real run, started once."""
+    from hyperargs import StrArg
+    from lmfuser.runners import ddp_runner
+
+    class Config:
+        project_name = StrArg('p')
+        run_name = StrArg('r')
+
+        def to_dict(self) -> dict:
+            return {}
+
+    calls = []
+    logged = []
+
+    class Run:
+        def log(self, data, step=None) -> None:
+            logged.append((data, step))
+
+    run = Run()
+    init = ddp_runner.wandb.init
+    ddp_runner.wandb.init = lambda **kwargs: calls.append(kwargs) or run
+    try:
+        fakes = []
+        for rank in (1, 0):
+            fake = type('Fake', (), {})()
+            fake.config, fake._rank, fake._run = Config(), rank, None
+            fakes.append(fake)
+        worker, chief = fakes
+        assert ddp_runner.DDPRunner._wandb.fget(worker) is None and not calls
+        assert ddp_runner.DDPRunner._wandb.fget(chief) is run
+        assert ddp_runner.DDPRunner._wandb.fget(chief) is run
+        assert calls == [{'project': 'p', 'name': 'r', 'config': {}}], calls
+
+        # step_log writes through the run itself; other ranks return first
+        for fake in fakes:
+            fake.step = 7
+            fake.__class__._wandb = ddp_runner.DDPRunner._wandb
+            ddp_runner.DDPRunner.step_log(fake, {'loss': 1.0}, console=False)
+        assert logged == [({'loss': 1.0}, 7)], logged
+    finally:
+        ddp_runner.wandb.init = init
+    print('PASS 11: the wandb run is started once, by rank 0 alone, and logged through')
+
+
+def test_ranks_agree_on_the_slowest_epoch() -> None:
+    """Two gloo ranks at epochs 3 and 1 both read 1, through one reused buffer."""
+    env = dict(os.environ, CUDA_VISIBLE_DEVICES='')
+    r = subprocess.run(
+        [sys.executable, '-m', 'torch.distributed.run', '--standalone', '--nnodes=1',
+         '--nproc_per_node=2', os.path.join(os.path.dirname(__file__), '_epoch_worker.py')],
+        capture_output=True, text=True, timeout=240, env=env,
+    )
+    assert 'EPOCH_SYNC_OK' in r.stdout, r.stdout[-2000:] + r.stderr[-2000:]
+    print('PASS 12: ranks agree on the minimum epoch without reallocating')
+
+
 if __name__ == '__main__':
     test_seed_is_deterministic_across_processes()
     test_seed_survives_a_resume()
@@ -242,4 +335,7 @@ if __name__ == '__main__':
     test_pre_epoch_is_not_double_counted_on_resume()
     test_log_scalar_accepts_what_float_accepts()
     test_eval_fsdp_dispatch_matches_training()
+    test_stop_by_epoch_reads_the_agreed_count()
+    test_wandb_run_is_started_once_and_only_on_rank_0()
+    test_ranks_agree_on_the_slowest_epoch()
     print('ALL PASS')
@@ -0,0 +1,388 @@
+"""Task configuration and dataloader wiring (lmfuser.task).
+
+Run:  python tests/test_task.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+_DATA_SRC = os.path.join(os.path.dirname(__file__), '..', '..', 'LMFuser-Data', 'src')
+if os.path.isdir(_DATA_SRC):
+    sys.path.insert(0, _DATA_SRC)
+
+
+class _FakeLoader:
+    """Three batches per epoch, each after `delay` seconds."""
+
+    def __init__(self, name: str, delay: float) -> None:
+        self.name = name
+        self.delay = delay
+        self.epoch = 0
+
+    def __iter__(self):
+        for i in range(3):
+            time.sleep(self.delay)
+            yield {'path': self.name, 'i': i}
+        self.epoch += 1
+
+
+def test_out_of_order_is_not_held_back_by_a_slow_path() -> None:
+    """In mixture order every batch of the fast path would wait its turn
+    behind the slow one; out of order, the fast path keeps flowing."""
+    from lmfuser.task import OutOfOrderDataLoader
+
+    loader = OutOfOrderDataLoader(
+        [_FakeLoader('slow', 1.0), _FakeLoader('fast', 0.01)], in_flight=2, stagger=0.0)
+    try:
+        it = iter(loader)
+        t0 = time.perf_counter()
+        batches = [next(it) for _ in range(6)]
+        elapsed = time.perf_counter() - t0
+        assert all(b['path'] == 'fast' for b in batches), batches
+        assert elapsed < 0.9, f'the fast path waited on the slow one ({elapsed:.2f}s)'
+        # the slow path has not finished a pass yet, so neither has the loader
+        assert loader.epoch == 0
+    finally:
+        loader.close()
+    print('PASS 1: out-of-order loader yields batches as they arrive')
+
+
+def test_out_of_order_surfaces_a_dead_reader() -> None:
+    from lmfuser.task import OutOfOrderDataLoader
+
+    class Broken:
+        epoch = 0
+
+        def __iter__(self):
+            raise OSError('remote path went away')
+            yield
+
+    loader = OutOfOrderDataLoader([Broken()], stagger=0.0)
+    try:
+        next(iter(loader))
+    except RuntimeError as e:
+        assert isinstance(e.__cause__, OSError), e.__cause__
+    else:
+        raise AssertionError('a dead reader thread went unnoticed')
+    finally:
+        loader.close()
+    print('PASS 2: a reader thread that dies is reported, not waited on forever')
+
+
+def test_resizing_one_task_leaves_its_siblings_alone() -> None:
+    """The count monitors grow the path lists in place. A list still
+    inherited from the class is shared, so growing it used to hand every later
+    task the first one's paths."""
+    from lmfuser.task import Task, Tasks
+
+    tasks = Tasks.from_dict({'num_tasks': 2, 'tasks': [
+        {'task_name': 'Task', 'conf': {
+            'num_train_data_path': 3,
+            'train_data_path_list': ['a', 'b', 'c'],
+            'train_data_weights': [1.0, 1.0, 0.5],
+        }},
+        {'task_name': 'Task'},
+    ]})
+    first, second = (t['conf'] for t in tasks.to_dict()['tasks'])
+    assert first['train_data_path_list'] == ['a', 'b', 'c']
+    assert first['train_data_weights'] == [1.0, 1.0, 0.5]
+    assert len(second['train_data_path_list']) == 1, second['train_data_path_list']
+    assert len(Task().train_data_path_list) == 1, 'the class default was grown'
+
+    task = Task()
+    lst = task.train_data_path_list
+    task.num_train_data_path = task.num_train_data_path.parse(0)
+    assert task.train_data_path_list is lst and lst == []
+    assert len(task.train_data_weights) == 0
+
+    tasks = Tasks()
+    tasks.num_tasks = tasks.num_tasks.parse(3)
+    assert len(tasks.tasks) == len(tasks.task_weights) == 3
+    assert len(set(map(id, tasks.tasks))) == 3, 'new task slots share one selector'
+    tasks.num_tasks = tasks.num_tasks.parse(1)
+    assert len(tasks.tasks) == len(tasks.task_weights) == 1
+    assert len(Tasks.tasks) == 1
+    print('PASS 3: list fields are resized per instance, in place')
+
+
+def test_task_list_sees_subclasses_defined_after_the_first_call() -> None:
+    """task_list() is memoised; a task class defined later must still show
+    up, or it cannot be selected by name."""
+    import lmfuser.task
+    from lmfuser.task import TaskBase, TaskSelector, task_list
+
+    task_list()
+    cached = lmfuser.task._task_names
+    task_list()
+    assert lmfuser.task._task_names is cached, 'the subclass tree is walked on every call'
+
+    class LateTask(TaskBase):
+        pass
+
+    assert 'LateTask' in task_list()
+    selector = TaskSelector.from_dict({'task_name': 'LateTask'})
+    assert type(selector.conf) is LateTask
+    print('PASS 4: task_list is cached and still sees new task classes')
+
+
+def test_resolved_sources_are_cached_until_a_path_changes() -> None:
+    from lmfuser.task import Task
+
+    task = Task.from_dict({'num_train_data_path': 2, 'train_data_path_list': ['a', 'b']})
+    sources = task._resolve_sources('train')
+    assert sources == (('a', 'b'), (1.0, 1.0))
+    assert task._resolve_sources('train') is sources, 'the paths were read out again'
+
+    task.parse_dict({'train_data_path_list': ['a', 'c']})
+    assert task._resolve_sources('train')[0] == ('a', 'c')
+    task.num_train_data_path = task.num_train_data_path.parse(1)
+    assert task._resolve_sources('train') == (('a',), (1.0,))
+    print('PASS 5: resolved paths are cached and dropped when the paths change')
+
+
+def test_parallel_loader_init_builds_tasks_concurrently() -> None:
+    from lmfuser.task import LoaderParams, TaskBase, Tasks
+
+    built: list[int] = []
+
+    class SlowToOpen(TaskBase):
+        def _get_eval_dataloader(self, params):
+            time.sleep(0.5)
+            built.append(params.rank)
+            return self
+
+    tasks = Tasks.from_dict({'num_tasks': 3, 'parallel_loader_init': True, 'tasks': [
+        {'task_name': 'SlowToOpen'}, {'task_name': 'SlowToOpen'}, {'task_name': 'SlowToOpen'},
+    ]})
+    tasks.tasks[2].conf = tasks.tasks[0].conf
+    t0 = time.perf_counter()
+    loaders = tasks.get_eval_dataloaders(LoaderParams(
+        batch_size=1, seed=0, shuffle=False, prefetch_factor=1, ignore_error=False, qps=None,
+        instruct_timeout=1.0, worker_timeout=1.0, num_workers=1, rank=0, world_size=1))
+    elapsed = time.perf_counter() - t0
+    assert elapsed < 0.9, f'tasks were built one after another ({elapsed:.2f}s)'
+    assert loaders == [tasks.tasks[0].conf, tasks.tasks[1].conf, tasks.tasks[0].conf]
+    assert len(built) == 2, 'a task listed twice was built twice'
+    print('PASS 6: task loaders are built concurrently, each task object once')
+
+
+def test_scanner_class_is_looked_up_once_per_scanner_type() -> None:
+    from lmfuser_data.scanners import Scanner
+    from lmfuser.task import Task
+
+    task = Task()
+    scanner_cls = task._get_scanner_cls()
+    assert scanner_cls is Scanner.get_subclass('C4Scanner')
+    task._scanner_cls = object     # stands in for the cached lookup
+    assert task._get_scanner_cls() is object, 'the scanner class was looked up again'
+    task.scanner_type = task.scanner_type.parse('ParquetScanner')
+    assert task._get_scanner_cls() is Scanner.get_subclass('ParquetScanner')
+    print('PASS 7: the scanner class is cached until scanner_type changes')
+
+
+def test_startup_stagger_delays_only_the_first_pass() -> None:
+    import pickle
+    from lmfuser.task import Task, _StaggeredStart
+
+    task = Task.from_dict({'startup_stagger': 0.1})
+    assert task._get_worker_flow(num_workers=1, worker_timeout=30.0) is None, 'a lone worker has nobody to wait for'
+    flow = task._get_worker_flow(num_workers=3, worker_timeout=30.0)
+    assert isinstance(flow, _StaggeredStart) and abs(flow.spread - 0.3) < 1e-9
+    # a worker still waiting out its stagger when worker_timeout runs out fails the first batch
+    try:
+        task._get_worker_flow(num_workers=3, worker_timeout=0.3)
+    except ValueError as e:
+        assert 'startup_stagger' in str(e) and 'worker_timeout' in str(e)
+    else:
+        raise AssertionError('a stagger longer than worker_timeout was accepted')
+
+    # spawned workers receive it pickled
+    assert pickle.loads(pickle.dumps(_StaggeredStart(0.2, None))).spread == 0.2
+    flow = _StaggeredStart(0.2, lambda rows: (r * 2 for r in rows))
+    stream = flow(iter([1, 2]))
+    t0 = time.perf_counter()
+    assert list(stream) == [2, 4], 'the task flow function was not applied'
+    assert time.perf_counter() - t0 < 0.25
+    t0 = time.perf_counter()
+    assert list(flow(iter([3]))) == [6]
+    assert time.perf_counter() - t0 < 0.01, 'the worker waited again on its next pass'
+    print('PASS 8: startup stagger wraps the flow and waits only before the first pass')
+
+
+def test_bucket_shuffle_ramps_up_from_a_small_bucket() -> None:
+    from lmfuser.task import Task, _BucketShuffle
+
+    pulled = []
+
+    def source(n: int):
+        for i in range(n):
+            pulled.append(i)
+            yield i
+
+    stream = _BucketShuffle(size=8, init=2, increment=2, seed=0, flow_fn=None)(source(100))
+    first = next(stream)
+    assert len(pulled) == 3, f'the first row waited on {len(pulled)} rows, not on the initial bucket'
+    rest = [first, *stream]
+    assert sorted(rest) == list(range(100)), 'rows were lost or repeated'
+    assert rest != list(range(100)), 'rows were not shuffled'
+
+    task = Task.from_dict({'bucket_size': 16, 'bucket_size_init': 4})
+    flow = task._get_worker_flow(num_workers=2, worker_timeout=30.0, shuffle_seed=7)
+    assert isinstance(flow, _BucketShuffle) and (flow.size, flow.init, flow.increment) == (16, 4, 4)
+    assert task._get_worker_flow(num_workers=2, worker_timeout=30.0) is None, 'an unshuffled loader got a shuffle bucket'
+    print('PASS 9: the shuffle bucket opens small and grows to its full size')
+
+
+def test_loaders_are_cached_on_their_params() -> None:
+    from dataclasses import replace
+    from lmfuser.task import LoaderParams, Task
+
+    params = LoaderParams(
+        batch_size=2, seed=0, shuffle=False, prefetch_factor=1, ignore_error=False, qps=None,
+        instruct_timeout=1.0, worker_timeout=1.0, num_workers=1, rank=0, world_size=1)
+    task = Task.from_dict({'train_dataloader_type': 'empty'})
+    loader = task._get_train_dataloader(params)
+    assert task._get_train_dataloader(replace(params)) is loader, 'equal params built a second loader'
+    assert task._get_train_dataloader(replace(params, rank=1)) is not loader, 'another rank got this rank\'s loader'
+    task.close()
+    assert task._get_train_dataloader(params) is not loader, 'close() kept the cached loader'
+    # a config change the params do not cover releases the cached loaders too
+    for field, value in [('in_flight', 8), ('scanner_type', 'C4Scanner'), ('train_data_path_list', ['other'])]:
+        loader = task._get_train_dataloader(params)
+        task.parse_dict({field: value})
+        assert task._get_train_dataloader(params) is not loader, f'a change to {field} kept the cached loader'
+    # an empty loader reads nothing: neither the paths nor the scanner were resolved
+    assert task._resolved_sources == {} and task._scanner_cls is None
+    print('PASS 10: loaders are cached per LoaderParams')
+
+
+def test_superseded_and_closed_loaders_stop_their_workers() -> None:
+    import queue
+    from dataclasses import replace
+    from types import SimpleNamespace
+    from lmfuser.task import LoaderParams, Task
+
+    class Process:
+        def __init__(self, instructions: queue.Queue) -> None:
+            self.instructions = instructions
+            self.terminated = False
+
+        def is_alive(self) -> bool:
+            return self.instructions.empty() and not self.terminated
+
+        def join(self, timeout: float) -> None:
+            pass
+
+        def terminate(self) -> None:
+            self.terminated = True
+
+    def sharded_loader():
+        # the shape of a sharded DataLoader: no close(), row workers per distributor
+        workers = []
+        for _ in range(2):
+            instructions: queue.Queue = queue.Queue()
+            workers.append(SimpleNamespace(instruct_queue=instructions, worker=Process(instructions)))
+        return SimpleNamespace(distributors=[SimpleNamespace(workers=workers)])
+
+    params = LoaderParams(
+        batch_size=2, seed=0, shuffle=False, prefetch_factor=1, ignore_error=False, qps=None,
+        instruct_timeout=1.0, worker_timeout=1.0, num_workers=1, rank=0, world_size=1)
+    task = Task.from_dict({'train_dataloader_type': 'empty'})
+    old = sharded_loader()
+    task._train_dataloaders[params] = old
+    task._get_train_dataloader(replace(params, rank=1))
+    assert all(not w.worker.is_alive() for w in old.distributors[0].workers), 'superseded loader kept its workers'
+    assert old not in task._train_dataloaders.values()
+
+    closed = sharded_loader()
+    task._eval_dataloaders[params] = closed
+    task.close()
+    assert all(not w.worker.is_alive() for w in closed.distributors[0].workers), 'close() left workers running'
+    assert not task._eval_dataloaders
+    print('PASS 12: superseded and closed loaders stop their row workers')
+
+
+def test_out_of_order_rejects_all_zero_weights() -> None:
+    from lmfuser.task import LoaderParams, Task
+
+    params = LoaderParams(
+        batch_size=2, seed=0, shuffle=False, prefetch_factor=1, ignore_error=False, qps=None,
+        instruct_timeout=1.0, worker_timeout=1.0, num_workers=1, rank=0, world_size=1)
+    task = Task.from_dict({
+        'train_dataloader_type': 'sharded', 'out_of_order': True,
+        'num_train_data_path': 2, 'train_data_path_list': ['a', 'b'], 'train_data_weights': [0.0, 0.0],
+    })
+    try:
+        task._get_train_dataloader(params)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('all-zero weights built a loader that blocks forever')
+    print('PASS 13: out_of_order rejects all-zero path weights')
+
+
+def test_single_file_loader_needs_a_prefetch_with_workers() -> None:
+    """torch only reports a zero prefetch_factor on the first batch, after
+    every loader has been built."""
+    from lmfuser.task import LoaderParams, Task
+
+    params = LoaderParams(
+        batch_size=2, seed=0, shuffle=False, prefetch_factor=0, ignore_error=False, qps=None,
+        instruct_timeout=1.0, worker_timeout=1.0, num_workers=1, rank=0, world_size=1)
+    task = Task.from_dict({'num_test_data_path': 1})
+    for build in (task._get_train_dataloader, task._get_eval_dataloader, task._get_test_dataloader):
+        try:
+            build(params)
+        except ValueError as e:
+            assert 'row_prefetch' in str(e)
+        else:
+            raise AssertionError(f'{build.__name__} built a loader torch fails on')
+    print('PASS 14: a single file loader with workers needs row_prefetch >= 1')
+
+
+def test_task_list_resize_raises_nothing_for_the_config_layer_to_swallow() -> None:
+    """Conf.__init__ turns a failing monitor into a logged warning, so a
+    change_task_list that referenced a missing field would leave tasks and
+    task_weights out of step without failing anything."""
+    import logging
+    from lmfuser.task import Tasks
+
+    class Collect(logging.Handler):
+        def __init__(self) -> None:
+            super().__init__(logging.WARNING)
+            self.records: list[logging.LogRecord] = []
+
+        def emit(self, record: logging.LogRecord) -> None:
+            self.records.append(record)
+
+    handler = Collect()
+    hyperargs_logger = logging.getLogger('hyperargs')
+    hyperargs_logger.addHandler(handler)
+    try:
+        tasks = Tasks.from_dict({'num_tasks': 2, 'task_weights': [0.25, 0.75]})
+        tasks.change_task_list()     # monitors are re-run on every assignment
+    finally:
+        hyperargs_logger.removeHandler(handler)
+    assert not handler.records, [r.getMessage() for r in handler.records]
+    assert [w.value() for w in tasks.task_weights] == [0.25, 0.75]
+    assert len(tasks.tasks) == 2
+    print('PASS 11: resizing the task list keeps tasks and task_weights in step')
+
+
+if __name__ == '__main__':
+    test_out_of_order_is_not_held_back_by_a_slow_path()
+    test_out_of_order_surfaces_a_dead_reader()
+    test_resizing_one_task_leaves_its_siblings_alone()
+    test_task_list_sees_subclasses_defined_after_the_first_call()
+    test_resolved_sources_are_cached_until_a_path_changes()
+    test_parallel_loader_init_builds_tasks_concurrently()
+    test_scanner_class_is_looked_up_once_per_scanner_type()
+    test_startup_stagger_delays_only_the_first_pass()
+    test_bucket_shuffle_ramps_up_from_a_small_bucket()
+    test_loaders_are_cached_on_their_params()
+    test_task_list_resize_raises_nothing_for_the_config_layer_to_swallow()
+    test_superseded_and_closed_loaders_stop_their_workers()
+    test_out_of_order_rejects_all_zero_weights()
+    test_single_file_loader_needs_a_prefetch_with_workers()
+    print('ALL PASS')